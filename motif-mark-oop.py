@@ -2,8 +2,27 @@
 
 import argparse
 import re
-import random
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import groupby, product
+from operator import methodcaller
+from math import prod
+import ahocorasick
 import cairo
+import numpy as np
+try:
+    from numba import njit
+    HAVE_NUMBA = True
+except ImportError:  # numba is optional; without it the Shift-And kernel is not used (regex is faster)
+    HAVE_NUMBA = False
+    def njit(*args, **kwargs):
+        return lambda func: func
+try:
+    import hyperscan
+except ImportError:  # hyperscan is optional; without it motifs go through Aho-Corasick, Shift-And and regex
+    hyperscan = None
 
 
 # Global variables for Pycairo 
@@ -13,68 +32,67 @@ LEGEND_ITEM_SPACING = 40  # Space between each legend item
 LEGEND_RECT_WIDTH = 30  # Width of rectangles in legend
 LEGEND_RECT_HEIGHT = 10  # Height of rectangles in legend
 TEXT_OFFSET = 3  # Space between rectangle and text
-
-class Motif:
-
-    MOTIF_HEIGHT = 10  # Height of motif rectangle
-    TRANSPARENCY = 0.7  # 0 = fully transparent, 1 = fully opaque
-
-    def __init__(self, start, stop, color):
-        self.start = start
-        self.stop = stop
-        self.color = color  # (R,G,B) tuple
-
-    def draw(self, ctx, y_position):
-        ctx.set_antialias(cairo.ANTIALIAS_NONE)  
-        
-        # Adjust transparency to visualize overlapping motifs
-        ctx.set_source_rgba(self.color[0], self.color[1], self.color[2], self.TRANSPARENCY)  
-
-        # Draw the motif rectangle
-        ctx.rectangle(self.start + LEFT_PADDING, y_position - self.MOTIF_HEIGHT / 2, 
-                      self.stop - self.start, self.MOTIF_HEIGHT)
-        ctx.fill()
-
-        ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)  # Reset anti-aliasing
-    
-    def __repr__(self):
-        return f"Color: {self.color}, Position: ({self.start}, {self.stop})"
+MOTIF_HEIGHT = 10  # Height of motif rectangle
+MOTIF_TRANSPARENCY = 0.7  # 0 = fully transparent, 1 = fully opaque
+
+# Bases matched by each ambiguous nucleotide code
+IUPAC_CODES = {'y': 'ctu',
+               't': 'ut',
+               'u': 'ut',
+               'r': 'ag',
+               'm': 'ac',
+               'k': 'gt',
+               's': 'gc',
+               'w': 'at',
+               'h': 'act',
+               'b': 'cgt',
+               'v': 'acg',
+               'd': 'agt',
+               'n': 'atcgu'}
+MAX_EXPANSIONS = 1024  # Motifs with more concrete sequences than this are matched by Shift-And (or regex) instead
+MAX_SHIFT_AND_LENGTH = 63  # Longest motif that fits in the int64 Shift-And state; longer ones use regex
+
+# Every motif site of every gene group, stored column-wise with one row per site:
+# color_idx (int32) indexes the motif's MotifPattern, start/stop (float32) are positions
+# in the gene, and gene_idx (int32) indexes GeneGroup.GENEGROUP_LIST
+MotifTable = namedtuple("MotifTable", ["color_idx", "start", "stop", "gene_idx"])
 
 class Exon:
 
     EXON_HEIGHT = 10
     EXON_COLOR = (0, 0, 0)  # Black
 
+    __slots__ = ("start", "stop")
+
     def __init__(self, start, stop):
         self.start = start
         self.stop = stop
     
     def draw(self, ctx, y_position):
-        ctx.set_antialias(cairo.ANTIALIAS_NONE)  # Disable anti-aliasing
         ctx.set_source_rgb(*self.EXON_COLOR) 
         ctx.rectangle(self.start + LEFT_PADDING, y_position - self.EXON_HEIGHT / 2, 
                       self.stop - self.start, self.EXON_HEIGHT)
         ctx.fill()
-        ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)  # Reset anti-aliasing to default
 
 
     def __repr__(self):
         return f"Exstart: {self.start}, Exstop: {self.stop}"
 
 class Gene:
+
+    __slots__ = ("start", "stop", "name")
+
     def __init__(self, start, stop, name):
         self.start = start
         self.stop = stop
         self.name = name
 
     def draw(self, ctx, y_position):
-        ctx.set_antialias(cairo.ANTIALIAS_NONE)
         ctx.set_source_rgb(0, 0, 0)  # Black line
         ctx.set_line_width(2)
         ctx.move_to(self.start + LEFT_PADDING, y_position)
         ctx.line_to(self.stop + LEFT_PADDING, y_position)
         ctx.stroke()
-        ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)
 
         # Draw gene name (FASTA header) above the gene group
         ctx.set_source_rgb(0, 0, 0)
@@ -90,120 +108,276 @@ class GeneGroup:
     # Stores all instantiated gene_group objects
     GENEGROUP_LIST = []
 
-    def __init__(self, exon: Exon, motifs: list[Motif], gene: Gene):
+    __slots__ = ("exon", "gene")
+
+    def __init__(self, exon: Exon, gene: Gene):
         self.exon = exon
-        self.motifs = motifs
         self.gene = gene
         GeneGroup.GENEGROUP_LIST.append(self)
 
     def draw(self, ctx, y_position):
+        # Motifs are drawn for all gene groups at once by draw_motifs
         self.gene.draw(ctx, y_position)
         self.exon.draw(ctx, y_position)
-        for motif in self.motifs:
-            motif.draw(ctx, y_position)
 
     def __repr__(self):
-        return f"Genegroup = Exon: {self.exon}\nMotifs: {self.motifs}\nGene: {self.gene}"
+        return f"Genegroup = Exon: {self.exon}\nGene: {self.gene}"
+
+class MotifPattern:
+    # Compiled once per motif in each matching process and reused for every gene
+
+    __slots__ = ("motif", "regex", "table")
+
+    def __init__(self, motif: str):
+        self.motif = motif.lower()
+        self.regex = compile_motif(self.motif)
+        # None if numba is missing or the motif is too long for the Shift-And kernel
+        use_shift_and = HAVE_NUMBA and len(self.motif) <= MAX_SHIFT_AND_LENGTH
+        self.table = build_mask_table(self.motif) if use_shift_and else None
+
+    def __repr__(self):
+        return f"Motif: {self.motif}"
+
+def draw_motifs(ctx, motif_table: MotifTable, colors: list, y_positions: np.ndarray) -> None:
+    '''Takes the (scaled) MotifTable, the color of each motif, and the y position of each gene group and
+    draws every motif rectangle with one source change and one fill per color.'''
+    x = motif_table.start + LEFT_PADDING
+    y = y_positions[motif_table.gene_idx] - MOTIF_HEIGHT / 2
+    width = motif_table.stop - motif_table.start
+    for color_idx, color in enumerate(colors):
+        # Adjust transparency to visualize overlapping motifs
+        ctx.set_source_rgba(*color, MOTIF_TRANSPARENCY)
+        rows = motif_table.color_idx == color_idx
+        for rect in zip(x[rows].tolist(), y[rows].tolist(), width[rows].tolist()):
+            ctx.rectangle(*rect, MOTIF_HEIGHT)
+        ctx.fill()
+
+def record_gene_layer(width: int, height: int, y_positions: list) -> cairo.RecordingSurface:
+    '''Draws every (scaled) GeneGroup at its y position without anti-aliasing onto a RecordingSurface and
+    returns it, so the static gene layer can be replayed with set_source_surface + paint under any motifs.'''
+    layer = cairo.RecordingSurface(cairo.CONTENT_COLOR_ALPHA, cairo.Rectangle(0, 0, width, height))
+    layer_ctx = cairo.Context(layer)
+    layer_ctx.set_antialias(cairo.ANTIALIAS_NONE)
+    for gene_group, y_position in zip(GeneGroup.GENEGROUP_LIST, y_positions):
+        gene_group.draw(layer_ctx, y_position)
+    return layer
 
 def get_args():
     parser = argparse.ArgumentParser(description="Visualize protein binding motifs in nucleic acid sequences")
     parser.add_argument("-f", "--fasta", help="Input fasta file")
     parser.add_argument("-m", "--motifs", help="Input motifs file")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Number of worker processes for motif matching (default: 1)")
     return parser.parse_args()
 
-def oneline_fasta(file: str, out_file: str) -> None:
-    '''Takes path to FASTA file and output file name as arguments. Converts each record in file to single-line FASTA record and writes to out_file. 
-    Returns None.'''
-    with open(file, "r") as fh, open(out_file, "w") as wf:
-        first_time: bool=True
-        for line in fh:
-            if first_time:
-                wf.write(line)
-                first_time = False
-            elif ">" in line:
-                wf.write(f'\n{line}')
-            else:
-                wf.write(line.strip("\n"))
-
+def iter_fasta(file: str):
+    '''Takes path to FASTA file and yields a (header, sequence) tuple for each record in a single pass,
+    joining multi-line sequences. The header excludes the leading ">".'''
+    header = None
+    with open(file, "r") as fh:
+        # alternating runs of header lines and sequence lines
+        for is_header, lines in groupby(fh, key=methodcaller("startswith", ">")):
+            if is_header:
+                *_, line = lines # headers without sequence lines are dropped
+                header = line[1:].strip()
+            elif header is not None:
+                yield header, ''.join(map(str.strip, lines))
+
+@lru_cache(maxsize=None)
 def build_regex(motif: str) -> str:
     '''Returns a regex pattern that matches all possible combinations of
     the input motif sequence (which needs to be all lowercase).'''
-    # dict contains regex patterns for each ambiguous nucleotide base
-    mapping = {'y': '[ctu]',
-               't': '[ut]',
-               'u': '[ut]',
-               'r': '[ag]',
-               'm': '[ac]',
-               'k': '[gt]',
-               's': '[gc]',
-               'w': '[at]',
-               'h': '[act]',
-               'b': '[cgt]',
-               'v': '[acg]',
-               'd': '[agt]',
-               'n': '[atcgu]'}
-
-    # replace ambiguous bases with regex; keep all other bases the same
-    pattern = ''.join(mapping.get(base, base) for base in motif)
+    # replace ambiguous bases with regex character classes; keep all other bases the same
+    pattern = ''.join(f"[{IUPAC_CODES[base]}]" if base in IUPAC_CODES else base for base in motif)
     return pattern
 
-def find_motif(seq: str, motif: str) -> list:
-    '''Takes gene sequence and motif sequence and returns a list of tuples containing start and end indices of
-    all sites in the sequence where motif was found.'''
-    seq = seq.lower()
-    motif = motif.lower()
-    pattern = build_regex(motif) #get generalized regex pattern of motif
-    matches: list = []
+def expand_motif(motif: str) -> list:
+    '''Returns a list of every concrete sequence matched by the input motif sequence
+    (which needs to be all lowercase).'''
+    return [''.join(bases) for bases in product(*(IUPAC_CODES.get(base, base) for base in motif))]
+
+def build_automaton(motifs: list) -> tuple:
+    '''Takes list of motif sequences and returns an Aho-Corasick automaton over the concrete sequences of
+    every motif, which yields lists of (motif index, motif length) values, and a list of indices of motifs too
+    ambiguous to expand that have to be matched another way.'''
+    automaton = ahocorasick.Automaton()
+    unexpanded_ids: list = []
+    for motif_id, motif in enumerate(motifs):
+        motif = motif.lower()
+        if prod(len(IUPAC_CODES.get(base, base)) for base in motif) > MAX_EXPANSIONS:
+            unexpanded_ids.append(motif_id)
+            continue
+        for word in expand_motif(motif):
+            # motifs can share concrete sequences, so each word maps to every motif it belongs to
+            automaton.add_word(word, automaton.get(word, []) + [(motif_id, len(motif))])
+    if len(automaton) > 0:
+        automaton.make_automaton()
+    return automaton, unexpanded_ids
+
+def build_mask_table(motif: str) -> array:
+    '''Returns a 256-entry Shift-And table for the input motif sequence (which needs to be all lowercase)
+    where bit i of table[ord(base)] is 1 iff motif position i accepts that base.'''
+    table = array('q', bytes(8 * 256))
+    for i, base in enumerate(motif):
+        for accepted in IUPAC_CODES.get(base, base):
+            table[ord(accepted)] |= 1 << i
+    return table
+
+@njit(cache=True)
+def shift_and_match(seq: bytes, table: array, m: int) -> np.ndarray:
+    '''Takes gene sequence as bytes, table from build_mask_table, and motif length (at most
+    MAX_SHIFT_AND_LENGTH) and returns an int32 array of start indices of all sites where motif was found.'''
+    hit = 1 << (m - 1)
+    state = 0
+    starts = np.empty(len(seq), dtype=np.int32)
+    n_hits = 0
     for i in range(len(seq)):
-        match = re.match(pattern, seq[i:])
-        if match:
-            matches.append((i + match.start(), i + match.end() - 1))
-    return matches
+        state = ((state << 1) | 1) & table[seq[i]]
+        if state & hit:
+            starts[n_hits] = i - m + 1
+            n_hits += 1
+    return starts[:n_hits]
+
+def build_database(motifs: list):
+    '''Takes list of lowercase motif sequences and returns a Hyperscan database that matches all of them
+    in a single scan, reporting each site under its motif index. Returns None if hyperscan is not installed.'''
+    if hyperscan is None or not motifs:
+        return None
+    database = hyperscan.Database()
+    database.compile(expressions=[build_regex(motif).encode() for motif in motifs],
+                     ids=list(range(len(motifs))),
+                     elements=len(motifs),
+                     flags=[hyperscan.HS_FLAG_SOM_LEFTMOST] * len(motifs))
+    return database
+
+def scan_database(seq: bytes, database, n_motifs: int) -> list:
+    '''Takes lowercase gene sequence as bytes, the database from build_database, and the number of
+    motifs and returns one list of (start, end) tuples per motif.'''
+    positions: list = [[] for _ in range(n_motifs)]
+
+    def on_match(motif_id, start, end, flags, context):
+        positions[motif_id].append((start, end - 1)) # end is exclusive
+
+    database.scan(seq, match_event_handler=on_match)
+    return positions
+
+def find_motif(seq: bytes, pattern: re.Pattern) -> list:
+    '''Takes lowercase gene sequence as bytes and compiled motif pattern (see compile_motif) and returns
+    a list of tuples containing start and end indices of all sites in the sequence where motif was found.'''
+    # one finditer scan; the lookahead keeps overlapping sites
+    return [(match.start(1), match.end(1) - 1) for match in pattern.finditer(seq)]
+
+@lru_cache(maxsize=None)
+def compile_motif(motif: str) -> re.Pattern:
+    '''Returns a compiled bytes regex for the motif sequence that captures overlapping sites
+    in group 1 when used with finditer.'''
+    return re.compile(f"(?=({build_regex(motif.lower())}))".encode())
+
+def find_motifs(seq: bytes, automaton: ahocorasick.Automaton, unexpanded_ids: list, motif_patterns: list) -> list:
+    '''Takes lowercase gene sequence as bytes, the automaton and unexpanded motif indices from
+    build_automaton, and the MotifPattern of every motif. Returns one list of (start, end) tuples per motif.'''
+    positions: list = [[] for _ in motif_patterns]
+    # single pass over the sequence for every motif in the automaton
+    if automaton.kind == ahocorasick.AHOCORASICK:
+        for end, hits in automaton.iter(seq.decode()): # pyahocorasick needs str
+            for motif_id, length in hits:
+                positions[motif_id].append((end - length + 1, end))
+    for motif_id in unexpanded_ids:
+        pattern = motif_patterns[motif_id]
+        if pattern.table is None:
+            positions[motif_id] = find_motif(seq, pattern.regex)
+            continue
+        length = len(pattern.motif)
+        positions[motif_id] = [(start, start + length - 1)
+                               for start in shift_and_match(seq, pattern.table, length).tolist()]
+    return positions
+
+# Compiled motif matchers of the current process, set up by init_worker
+MATCHERS: dict = {}
+
+def init_worker(motifs: list) -> None:
+    '''Takes list of motif sequences and compiles their matchers into MATCHERS for scan_gene.
+    Runs once in every worker process (and once in the main process when matching serially).'''
+    MATCHERS["patterns"] = [MotifPattern(motif) for motif in motifs]
+    # Match all motifs in one Hyperscan pass per gene if it is installed, otherwise
+    # all expandable motifs in one Aho-Corasick pass per gene
+    MATCHERS["database"] = build_database([pattern.motif for pattern in MATCHERS["patterns"]])
+    if MATCHERS["database"] is None:
+        MATCHERS["automaton"], MATCHERS["unexpanded_ids"] = build_automaton(
+            [pattern.motif for pattern in MATCHERS["patterns"]])
+
+def scan_gene(sequence: str) -> tuple:
+    '''Takes gene sequence and returns the (start, stop) of its exon, or None if it has no exon, and one list
+    of (start, end) tuples per motif (empty if there is no exon), using the matchers from init_worker.'''
+    # Convert to bytes once; exon spans the first to the last uppercase base
+    seq_bytes = sequence.encode()
+    is_exon = np.frombuffer(seq_bytes, dtype=np.uint8) < ord("a")
+    if not is_exon.any():
+        return None, []
+    exon = (int(is_exon.argmax()), len(is_exon) - 1 - int(is_exon[::-1].argmax()))
+
+    seq = seq_bytes.lower() # lowercase once per gene and shared by every motif scan
+    if MATCHERS["database"] is not None:
+        return exon, scan_database(seq, MATCHERS["database"], len(MATCHERS["patterns"]))
+    return exon, find_motifs(seq, MATCHERS["automaton"], MATCHERS["unexpanded_ids"], MATCHERS["patterns"])
 
 
 if __name__ == "__main__":
     args = get_args()
 
-    oneline_fasta(args.fasta, f"oneline_{args.fasta}")
-
     # 5 RGB colors
-    color_set = {(0.055, 0.722, 0.733),
-                 (0.471, 0.369, 0.941),
-                 (0.863, 0.149, 0.498),
-                 (0.996, 0.380, 0),
-                 (1, 0.690, 0)}
+    colors = [(0.055, 0.722, 0.733),
+              (0.471, 0.369, 0.941),
+              (0.863, 0.149, 0.498),
+              (0.996, 0.380, 0),
+              (1, 0.690, 0)]
     
-    # Assign a different color code to each motif using a dict
+    # Assign a color code to each motif (in motif file order) using a dict
     motif_dict: dict = {}
 
     with open(args.motifs, "r") as fh:
-        for line in fh:
-            line = line.strip()
-            motif_dict[line] = random.choice(list(color_set))
-            color_set.remove(motif_dict[line])
-
-    # Read in FASTA file and instantiate all Motif, Gene, Exon, and GeneGroup objects
-    with open(f"oneline_{args.fasta}", "r") as fh:
-        record: list = [] # to hold current record
-        for i, line in enumerate(fh):
-            line = line.strip()
-            record.append(line)
-            if i % 2 != 0:
-                motif_objects = []
-                for motif in motif_dict.keys():
-                    positions = find_motif(record[1], motif) #list of tuples of indices where motif occurs in sequence
-                    for pos in positions: #create unique Motif object for each occurrence
-                        mo = Motif(pos[0], pos[1], motif_dict[motif])
-                        motif_objects.append(mo)
-                exon = None # will be assigned to Exon object
-                try:
-                    exon_match = re.search("[ACTGU]+", record[1])
-                    exon = Exon(exon_match.start(), exon_match.end()-1)
-                except Exception as e:
-                    print("There's no exon in this gene, that can't be right.")
-                gene = Gene(0, len(record[1])-1, record[0])
-                gene_group = GeneGroup(exon, motif_objects, gene)
-                record.clear()
+        # skip blank lines (e.g. a trailing newline) so no backend ever gets an empty motif
+        for i, line in enumerate(filter(None, map(str.strip, fh))):
+            motif_dict[line] = colors[i % len(colors)]
+
+    # Find exons and motif sites of every gene, in worker processes if requested;
+    # drawing stays in the main process
+    records = list(iter_fasta(args.fasta))
+    sequences = [sequence for _, sequence in records]
+    if args.processes > 1:
+        with ProcessPoolExecutor(args.processes, initializer=init_worker, initargs=(list(motif_dict),)) as ex:
+            results = list(ex.map(scan_gene, sequences, chunksize=max(1, len(sequences) // (4 * args.processes))))
+    else:
+        init_worker(list(motif_dict))
+        results = map(scan_gene, sequences)
+
+    # Instantiate all Gene, Exon, and GeneGroup objects
+    group_positions: list = [] # per-motif positions of each GeneGroup, in GENEGROUP_LIST order
+    for (header, sequence), (exon_span, all_positions) in zip(records, results):
+        if exon_span is None:
+            print(f"There's no exon in {header}, that can't be right. Skipping it.")
+            continue
+        exon = Exon(*exon_span)
+        gene = Gene(0, len(sequence)-1, header)
+        gene_group = GeneGroup(exon, gene)
+        group_positions.append(all_positions)
+
+    # Preallocate the MotifTable columns from the total site count and fill them one
+    # motif of one gene group (a contiguous block of rows) at a time
+    n_sites = sum(len(positions) for all_positions in group_positions for positions in all_positions)
+    coords_array = np.empty((n_sites, 2), dtype=np.float32)  # (start, stop) of every motif site
+    motif_table = MotifTable(np.empty(n_sites, dtype=np.int32), coords_array[:, 0], coords_array[:, 1],
+                             np.empty(n_sites, dtype=np.int32))
+    row = 0
+    for group_idx, all_positions in enumerate(group_positions):
+        for motif_id, positions in enumerate(all_positions):
+            if not positions:
+                continue
+            block = slice(row, row + len(positions))
+            coords_array[block] = positions
+            motif_table.color_idx[block] = motif_id
+            motif_table.gene_idx[block] = group_idx
+            row += len(positions)
 
     # Draw Pycairo figure
     # Set dimensions of canvas
@@ -226,18 +400,24 @@ if __name__ == "__main__":
     max_gene_length = max(gene_group.gene.stop for gene_group in GeneGroup.GENEGROUP_LIST)
     scale_factor = (WIDTH - 2 * x_padding) / max_gene_length
 
-    # Draw each GeneGroup
+    coords_array *= scale_factor # one vectorized multiply for all motif starts and stops
+
+    # Scale each GeneGroup
     for i, gene_group in enumerate(GeneGroup.GENEGROUP_LIST):
         y_pos = y_padding + i * 80
         gene_group.gene.start *= scale_factor
         gene_group.gene.stop *= scale_factor
         gene_group.exon.start *= scale_factor
         gene_group.exon.stop *= scale_factor
-        for motif in gene_group.motifs:
-            motif.start *= scale_factor
-            motif.stop *= scale_factor
 
-        gene_group.draw(ctx, y_pos)
+    y_positions = y_padding + np.arange(len(GeneGroup.GENEGROUP_LIST)) * 80
+
+    # Replay the recorded gene layer, then draw all motifs batched by color on top without anti-aliasing
+    ctx.set_source_surface(record_gene_layer(WIDTH, HEIGHT, y_positions.tolist()), 0, 0)
+    ctx.paint()
+    ctx.set_antialias(cairo.ANTIALIAS_NONE)
+    draw_motifs(ctx, motif_table, list(motif_dict.values()), y_positions)
+    ctx.set_antialias(cairo.ANTIALIAS_DEFAULT)  # Reset anti-aliasing for the legend
 
     # Draw legend
     x_start = 5 
@@ -245,34 +425,34 @@ if __name__ == "__main__":
 
     ITEM_SPACING = 130  # Horizontal space between legend elements
 
-    # Gene legend
-    ctx.set_source_rgb(0, 0, 0)
-    ctx.move_to(x_start, y_start)
-    ctx.line_to(x_start + LEGEND_RECT_WIDTH, y_start)
-    ctx.stroke()
-    ctx.move_to(x_start + LEGEND_RECT_WIDTH + TEXT_OFFSET, y_start + 3)
-    ctx.show_text("Gene")
+    gene_x = x_start
+    exon_x = x_start + 100
+    # (x, color, label) of each motif legend, each motif horizontally aligned
+    motif_items = [(exon_x + (i + 1) * ITEM_SPACING, color, motif)
+                   for i, (motif, color) in enumerate(motif_dict.items())]
 
-    x_start += 100  # Move right for next item
+    # Same font as the gene names, which are now drawn on the recorded gene layer's own context
+    ctx.select_font_face("Arial")
+    ctx.set_font_size(18)
 
-    # Exon legend
+    # Gene and Exon legends share one black source: line, rectangle, then both labels
     ctx.set_source_rgb(0, 0, 0)
-    ctx.rectangle(x_start, y_start - LEGEND_RECT_HEIGHT / 2, LEGEND_RECT_WIDTH, LEGEND_RECT_HEIGHT)
+    ctx.move_to(gene_x, y_start)
+    ctx.line_to(gene_x + LEGEND_RECT_WIDTH, y_start)
+    ctx.stroke()
+    ctx.rectangle(exon_x, y_start - LEGEND_RECT_HEIGHT / 2, LEGEND_RECT_WIDTH, LEGEND_RECT_HEIGHT)
     ctx.fill()
-    ctx.move_to(x_start + LEGEND_RECT_WIDTH + TEXT_OFFSET, y_start + 3)
-    ctx.show_text("Exon")
-
-    x_start += ITEM_SPACING  
-
-    # Draw Motif Legends (each motif horizontally aligned)
-    for motif, color in motif_dict.items():
-        ctx.set_source_rgb(*color)  # Use motif color
-        ctx.rectangle(x_start, y_start - LEGEND_RECT_HEIGHT / 2, LEGEND_RECT_WIDTH, LEGEND_RECT_HEIGHT)
+    for x, label in ((gene_x, "Gene"), (exon_x, "Exon")):
+        ctx.move_to(x + LEGEND_RECT_WIDTH + TEXT_OFFSET, y_start + 3)
+        ctx.show_text(label)
+
+    # Draw Motif Legends; swatch and label share one source change per motif color
+    for x, color, label in motif_items:
+        ctx.set_source_rgb(*color)
+        ctx.rectangle(x, y_start - LEGEND_RECT_HEIGHT / 2, LEGEND_RECT_WIDTH, LEGEND_RECT_HEIGHT)
         ctx.fill()
-        ctx.move_to(x_start + LEGEND_RECT_WIDTH + TEXT_OFFSET, y_start + 3)
-        ctx.show_text(motif)
-
-        x_start += ITEM_SPACING  
+        ctx.move_to(x + LEGEND_RECT_WIDTH + TEXT_OFFSET, y_start + 3)
+        ctx.show_text(label)
 
     # Save the figure to PNG format with required prefix
     prefix = args.fasta.split(".")